@@ -0,0 +1,536 @@
+"""Shared CourtListener download helpers.
+
+Used by both ``build_corpus.py`` and ``download_opinions.py`` so that rate
+limiting, retries with backoff, connection reuse, and streaming PDFs to disk
+behave the same in each script.
+"""
+
+import asyncio
+import contextlib
+import json
+import logging
+import os
+import random
+import time
+from collections.abc import AsyncIterable, Awaitable, Callable, Iterable
+from pathlib import Path
+from typing import Any, TypeVar
+
+import httpx
+import ijson
+from tqdm import tqdm
+
+logger = logging.getLogger(__name__)
+
+COURTLISTENER_STORAGE_URL = "https://storage.courtlistener.com"
+USER_AGENT = "BiteSizeRAG-Corpus-Builder/1.0 (legal research; rate-limited)"
+
+# Rate limiting configuration - CourtListener is a small nonprofit, be very gentle
+BASE_DELAY_SECONDS = 3.0  # Starting delay between requests (conservative)
+MAX_RETRIES = 8  # Maximum retries on 429/5xx errors
+BACKOFF_FACTOR = 2.5  # Exponential backoff multiplier
+MAX_BACKOFF_SECONDS = 300  # Maximum backoff delay (5 minutes)
+MAX_CONCURRENT_DOWNLOADS = 4  # Default number of PDFs downloaded at once
+PDF_CONTENT_TYPES = ("application/pdf", "application/octet-stream")  # Accepted for PDFs
+PDF_MAGIC = b"%PDF"  # Every PDF body starts with these bytes
+METADATA_FILENAME = "metadata.json"  # Compacted corpus metadata
+JOURNAL_FILENAME = "metadata.jsonl"  # Opinions appended since the last compaction
+STREAM_CHUNK_SIZE = 64 * 1024  # Bytes per chunk when streaming PDFs to disk
+# Keep idle connections in the pool longer than the longest backoff, so httpx
+# itself never drops one during a wait. The server may still close it sooner,
+# in which case the next request reconnects (DNS, TCP, and TLS) as usual
+KEEPALIVE_EXPIRY_SECONDS = MAX_BACKOFF_SECONDS + 60.0
+
+T = TypeVar("T")
+
+
+class TokenBucket:
+    """Adaptive async token bucket that paces requests across concurrent tasks.
+
+    Tokens refill at ``rate`` per second up to ``capacity``. Each request
+    consumes one token, waiting for the bucket to refill when it is empty.
+    Successful responses nudge the rate up towards ``max_rate``; a 429
+    divides it down towards ``min_rate`` and empties the bucket, so the
+    rate settles just below whatever the server tolerates.
+    """
+
+    def __init__(
+        self,
+        rate: float,
+        *,
+        min_rate: float,
+        max_rate: float,
+        capacity: float = 1.0,
+        increase: float = 1.1,
+        decrease: float = 2.0,
+    ) -> None:
+        self.rate = rate
+        self.min_rate = min_rate
+        self.max_rate = max_rate
+        self.capacity = capacity
+        self.increase = increase
+        self.decrease = decrease
+        self.tokens = capacity
+        self._updated = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    def _refill(self) -> None:
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    async def acquire(self) -> None:
+        """Wait until a token is available, then consume it."""
+        async with self._lock:
+            while True:
+                self._refill()
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                await asyncio.sleep(max(0.0, (1 - self.tokens) / self.rate))
+
+    def on_success(self) -> None:
+        """Speed up after a request the server accepted."""
+        self._refill()
+        self.rate = min(self.rate * self.increase, self.max_rate)
+
+    def on_throttle(self) -> None:
+        """Slow down after the server answered 429."""
+        self._refill()
+        self.rate = max(self.rate / self.decrease, self.min_rate)
+        self.tokens = 0.0
+
+
+def create_client(concurrency: int = MAX_CONCURRENT_DOWNLOADS) -> httpx.AsyncClient:
+    """Create the HTTP/2 client shared by all requests in a run.
+
+    Args:
+        concurrency: Maximum number of requests in flight at once.
+
+    Returns:
+        Async HTTP client with pooled keep-alive connections.
+    """
+    limits = httpx.Limits(
+        max_connections=concurrency,
+        max_keepalive_connections=concurrency,
+        keepalive_expiry=KEEPALIVE_EXPIRY_SECONDS,
+    )
+    return httpx.AsyncClient(
+        headers={"User-Agent": USER_AGENT}, timeout=60.0, http2=True, limits=limits
+    )
+
+
+async def stream_with_retry(
+    client: httpx.AsyncClient,
+    bucket: TokenBucket | None,
+    url: str,
+    consume: Callable[[httpx.Response], Awaitable[T]],
+    params: dict[str, Any] | None = None,
+    *,
+    method: str = "GET",
+    headers: dict[str, str] | None = None,
+    follow_redirects: bool = False,
+) -> T:
+    """Stream an HTTP request with exponential backoff on rate limit/server errors.
+
+    The response body is not read up front; ``consume`` receives the open
+    streaming response once its status is known to be successful (or 304
+    Not Modified, for conditional requests). Errors raised while ``consume``
+    reads the body are retried like any other request error, so ``consume``
+    must tolerate being called again.
+
+    Args:
+        client: HTTP client for requests.
+        bucket: Rate limiter shared by all requests (None for no limit).
+        url: URL to request.
+        consume: Async callable that reads the successful response.
+        params: Optional query parameters.
+        method: HTTP method.
+        headers: Optional extra request headers.
+        follow_redirects: Whether to follow redirects.
+
+    Returns:
+        Whatever ``consume`` returns.
+
+    Raises:
+        httpx.HTTPError: If all retries are exhausted.
+    """
+    delay = BASE_DELAY_SECONDS
+    retry_after = 0.0  # Server-requested minimum wait before the next attempt
+    last_exception: Exception | None = None
+
+    for attempt in range(MAX_RETRIES + 1):
+        if attempt > 0:
+            # Full jitter: spread retries uniformly over the backoff window so
+            # concurrent tasks do not retry in lockstep. Retry-After is a hard floor.
+            sleep_time = max(retry_after, random.uniform(0, min(delay, MAX_BACKOFF_SECONDS)))
+            logger.info(
+                f"Rate limited. Waiting {sleep_time:.1f}s (attempt {attempt + 1}/{MAX_RETRIES + 1})"
+            )
+            await asyncio.sleep(sleep_time)
+            delay = min(delay * BACKOFF_FACTOR, MAX_BACKOFF_SECONDS)
+            retry_after = 0.0
+
+        # Wait for the shared rate limiter (always, to be respectful)
+        if bucket is not None:
+            await bucket.acquire()
+
+        try:
+            async with client.stream(
+                method,
+                url,
+                params=params or None,
+                headers=headers,
+                follow_redirects=follow_redirects,
+            ) as response:
+                # Handle rate limiting (429) and server errors (5xx)
+                if response.status_code == 429:
+                    if bucket is not None:
+                        bucket.on_throttle()
+                    # Check for Retry-After header
+                    retry_after_header = response.headers.get("Retry-After")
+                    if retry_after_header:
+                        with contextlib.suppress(ValueError):
+                            retry_after = float(retry_after_header)
+                    last_exception = httpx.HTTPStatusError(
+                        "Rate limited (429)",
+                        request=response.request,
+                        response=response,
+                    )
+                    continue
+
+                if response.status_code >= 500:
+                    last_exception = httpx.HTTPStatusError(
+                        f"Server error ({response.status_code})",
+                        request=response.request,
+                        response=response,
+                    )
+                    continue
+
+                # Raise for other client errors
+                if response.status_code != httpx.codes.NOT_MODIFIED:
+                    response.raise_for_status()
+                if bucket is not None:
+                    bucket.on_success()
+                return await consume(response)
+
+        except httpx.TimeoutException as e:
+            last_exception = e
+            logger.warning(f"Request timed out: {e}")
+            continue
+        except httpx.RequestError as e:
+            last_exception = e
+            logger.warning(f"Request failed: {e}")
+            continue
+
+    # All retries exhausted
+    if last_exception:
+        raise last_exception
+    raise httpx.HTTPError("All retries exhausted")
+
+
+async def request_with_retry(
+    client: httpx.AsyncClient,
+    bucket: TokenBucket | None,
+    url: str,
+    params: dict[str, Any] | None = None,
+    *,
+    method: str = "GET",
+    headers: dict[str, str] | None = None,
+    follow_redirects: bool = False,
+) -> httpx.Response:
+    """Make an HTTP request with retries and return the fully read response.
+
+    Args:
+        client: HTTP client for requests.
+        bucket: Rate limiter shared by all requests (None for no limit).
+        url: URL to request.
+        params: Optional query parameters.
+        method: HTTP method.
+        headers: Optional extra request headers.
+        follow_redirects: Whether to follow redirects.
+
+    Returns:
+        HTTP response with its body loaded.
+
+    Raises:
+        httpx.HTTPError: If all retries are exhausted.
+    """
+
+    async def read_body(response: httpx.Response) -> httpx.Response:
+        await response.aread()
+        return response
+
+    return await stream_with_retry(
+        client,
+        bucket,
+        url,
+        read_body,
+        params,
+        method=method,
+        headers=headers,
+        follow_redirects=follow_redirects,
+    )
+
+
+def existing_pdf_ids(opinions_dir: Path) -> set[str]:
+    """List the opinion IDs that already have a PDF in ``opinions_dir``.
+
+    Args:
+        opinions_dir: Directory of downloaded PDFs named ``<opinion_id>.pdf``.
+
+    Returns:
+        Set of opinion IDs (file names without the ``.pdf`` suffix).
+    """
+    with os.scandir(opinions_dir) as entries:
+        return {
+            entry.name[:-4]
+            for entry in entries
+            if entry.name.endswith(".pdf") and entry.is_file(follow_symlinks=False)
+        }
+
+
+def load_opinions(corpus_dir: Path) -> dict[str, dict[str, Any]]:
+    """Load corpus opinions from metadata.json and the metadata.jsonl journal.
+
+    Journal entries are replayed in order on top of metadata.json, so a
+    later entry for the same opinion replaces an earlier one.
+
+    Args:
+        corpus_dir: Corpus directory.
+
+    Returns:
+        Opinion metadata keyed by opinion ID, in corpus order.
+    """
+    opinions: dict[str, dict[str, Any]] = {}
+
+    metadata_path = corpus_dir / METADATA_FILENAME
+    if metadata_path.exists():
+        # Stream opinions one at a time rather than loading the whole tree
+        with metadata_path.open("rb") as metadata_file:
+            for item in ijson.items(metadata_file, "opinions.item", use_float=True):
+                opinions[str(item["opinion_id"])] = item
+
+    journal_path = corpus_dir / JOURNAL_FILENAME
+    if journal_path.exists():
+        with journal_path.open(encoding="utf-8") as journal:
+            for line in journal:
+                # A run killed mid-write can leave a partial last line
+                with contextlib.suppress(json.JSONDecodeError):
+                    item = json.loads(line)
+                    opinions[str(item["opinion_id"])] = item
+
+    return opinions
+
+
+class Downloader:
+    """Downloads opinion PDFs from CourtListener storage.
+
+    Every request goes through the shared rate limiter and retry logic, and
+    bodies are streamed to disk rather than buffered in memory. Existing
+    PDFs are checked against the ``content_length`` recorded in their
+    metadata, and optionally revalidated with a conditional HEAD request.
+    """
+
+    def __init__(
+        self,
+        client: httpx.AsyncClient,
+        bucket: TokenBucket | None = None,
+        *,
+        revalidate: bool = False,
+    ) -> None:
+        """Initialize the downloader.
+
+        Args:
+            client: HTTP client for requests.
+            bucket: Rate limiter shared by all requests (None for no limit).
+            revalidate: Send a HEAD request for each existing PDF to check it
+                is still current, instead of trusting it when its size matches.
+        """
+        self.client = client
+        self.bucket = bucket
+        self.revalidate = revalidate
+
+    async def fetch_pdf(self, local_path: str, output_path: Path) -> dict[str, Any] | None:
+        """Download a PDF from CourtListener storage.
+
+        The body is streamed to a ``.part`` file next to ``output_path`` and
+        renamed into place once complete, so an interrupted download never
+        leaves a truncated PDF behind.
+
+        Args:
+            local_path: Path on CourtListener storage (e.g., "pdf/2025/03/10/file.pdf").
+            output_path: Local path to save the file. Its directory must exist.
+
+        Returns:
+            The file's ``etag`` and ``content_length`` if the download
+            succeeded, None otherwise.
+        """
+        url = f"{COURTLISTENER_STORAGE_URL}/{local_path}"
+        part_path = output_path.with_name(f"{output_path.name}.part")
+
+        async def write_body(response: httpx.Response) -> dict[str, Any] | None:
+            # Storage answers some missing files with an HTML page; bail out on
+            # the headers or the first chunk instead of saving it as a PDF
+            content_type = response.headers.get("Content-Type", "")
+            if not content_type.startswith(PDF_CONTENT_TYPES):
+                return None
+            size = 0
+            # File I/O runs in worker threads so it never blocks the event
+            # loop the other downloads share
+            f = await asyncio.to_thread(part_path.open, "wb")
+            try:
+                async for chunk in response.aiter_bytes(STREAM_CHUNK_SIZE):
+                    if size == 0 and not chunk.startswith(PDF_MAGIC):
+                        return None
+                    await asyncio.to_thread(f.write, chunk)
+                    size += len(chunk)
+            finally:
+                await asyncio.to_thread(f.close)
+            if size == 0:
+                return None
+            return {"etag": response.headers.get("ETag"), "content_length": size}
+
+        try:
+            info = await stream_with_retry(
+                self.client, self.bucket, url, write_body, follow_redirects=True
+            )
+        except httpx.HTTPError as e:
+            part_path.unlink(missing_ok=True)
+            logger.warning(f"Failed to download {url}: {e}")
+            return None
+        if info is None:
+            part_path.unlink(missing_ok=True)
+            logger.warning(f"Failed to download {url}: response is not a PDF")
+            return None
+        part_path.replace(output_path)
+        return info
+
+    async def is_current(self, opinion: dict[str, Any], pdf_path: Path) -> bool:
+        """Check whether an existing PDF is complete and up to date.
+
+        A size that differs from the recorded ``content_length`` means the
+        file is truncated. With ``revalidate``, a HEAD request carrying the
+        recorded ETag as ``If-None-Match`` confirms the file is unchanged
+        (a 304, or a 200 serving the same ETag); when no ETag was recorded,
+        the served Content-Length is compared with the file size instead.
+
+        Args:
+            opinion: Opinion metadata, possibly with ``etag``/``content_length``.
+            pdf_path: Path of the existing PDF.
+
+        Returns:
+            True if the PDF can be kept, False if it should be downloaded again.
+        """
+        size = pdf_path.stat().st_size
+        expected_size = opinion.get("content_length")
+        if expected_size is not None and size != expected_size:
+            return False
+        if not self.revalidate:
+            return True
+
+        url = f"{COURTLISTENER_STORAGE_URL}/{opinion['local_path']}"
+        etag: str | None = opinion.get("etag")
+        headers = {"If-None-Match": etag} if etag else None
+        try:
+            response = await request_with_retry(
+                self.client,
+                self.bucket,
+                url,
+                method="HEAD",
+                headers=headers,
+                follow_redirects=True,
+            )
+        except httpx.HTTPError as e:
+            logger.warning(f"Could not revalidate {url}, keeping existing file: {e}")
+            return True
+
+        if response.status_code == httpx.codes.NOT_MODIFIED:
+            return True
+        # Some servers ignore If-None-Match on HEAD and answer 200 instead
+        if etag:
+            served_etag: str | None = response.headers.get("ETag")
+            return served_etag == etag
+        served_size = response.headers.get("Content-Length")
+        return served_size is None or int(served_size) == size
+
+    async def fetch_all(
+        self,
+        opinions: Iterable[dict[str, Any]] | AsyncIterable[dict[str, Any]],
+        opinions_dir: Path,
+        *,
+        concurrency: int = MAX_CONCURRENT_DOWNLOADS,
+        total: int | None = None,
+        on_result: Callable[[dict[str, Any], str], None] | None = None,
+    ) -> list[tuple[dict[str, Any], str]]:
+        """Download PDFs for a stream of opinions concurrently.
+
+        Each opinion's download starts as soon as it arrives, so an async
+        source (such as a paginated search) keeps producing while earlier
+        PDFs download. Opinions whose PDF is already in ``opinions_dir`` are
+        skipped unless ``is_current`` finds it truncated or stale. Each
+        successful download records ``etag`` and ``content_length`` on its
+        opinion dict.
+
+        Args:
+            opinions: Opinion metadata with ``opinion_id`` and ``local_path``.
+            opinions_dir: Directory to save PDFs in, named ``<opinion_id>.pdf``.
+            concurrency: Maximum number of PDFs downloaded at once.
+            total: Expected number of opinions, for the progress bar.
+            on_result: Called with each opinion and its status as soon as it
+                and every opinion before it have finished, so calls arrive
+                in input order.
+
+        Returns:
+            Each opinion with its status, in input order: "downloaded",
+            "skipped", or "failed".
+        """
+        existing_pdfs = existing_pdf_ids(opinions_dir)
+        semaphore = asyncio.Semaphore(concurrency)
+        received: list[dict[str, Any]] = []
+        finished: dict[int, str] = {}
+        next_to_report = 0
+
+        def report(index: int, status: str) -> None:
+            nonlocal next_to_report
+            finished[index] = status
+            while on_result is not None and next_to_report in finished:
+                on_result(received[next_to_report], finished.pop(next_to_report))
+                next_to_report += 1
+
+        async def download_one(index: int, pbar: "tqdm[Any]") -> str:
+            opinion = received[index]
+            opinion_id = str(opinion["opinion_id"])
+            pdf_path = opinions_dir / f"{opinion_id}.pdf"
+
+            async with semaphore:
+                # Skip if already downloaded and still intact
+                if opinion_id in existing_pdfs and await self.is_current(opinion, pdf_path):
+                    status = "skipped"
+                else:
+                    info = await self.fetch_pdf(opinion["local_path"], pdf_path)
+                    if info is None:
+                        status = "failed"
+                    else:
+                        opinion.update(info)
+                        status = "downloaded"
+            pbar.update(1)
+            report(index, status)
+            return status
+
+        tasks: list[asyncio.Task[str]] = []
+        with tqdm(total=total, desc="Downloading PDFs", unit="files") as pbar:
+            if isinstance(opinions, AsyncIterable):
+                async for opinion in opinions:
+                    received.append(opinion)
+                    tasks.append(asyncio.create_task(download_one(len(tasks), pbar)))
+            else:
+                for opinion in opinions:
+                    received.append(opinion)
+                    tasks.append(asyncio.create_task(download_one(len(tasks), pbar)))
+            # The source may yield fewer opinions than expected
+            pbar.total = len(tasks)
+            pbar.refresh()
+            statuses = await asyncio.gather(*tasks)
+
+        return list(zip(received, statuses, strict=True))
@@ -13,7 +13,9 @@ Usage:
 Output:
     <data-dir>/<corpus>/
         opinions/       - PDF files named by opinion ID
-        metadata.json   - Opinion metadata for all downloaded documents
+        metadata.jsonl  - Metadata journal, one line per opinion as it downloads
+        metadata.json   - Compacted metadata for all opinions (written by --compact)
+        .search_cache/  - Cached search pages and the resume cursor (state.json)
 
 API Notes:
     - Search: GET https://www.courtlistener.com/api/rest/v4/search/?q=<query>&type=o
@@ -22,17 +24,38 @@ API Notes:
 """
 
 import argparse
-import contextlib
+import asyncio
+import hashlib
 import json
 import logging
-import random
+import os
+import shutil
 import sys
-import time
+from collections.abc import AsyncIterator, Collection
 from pathlib import Path
 from typing import Any
 
 import httpx
-from tqdm import tqdm
+import ijson
+
+from _courtlistener import (
+    BASE_DELAY_SECONDS,
+    JOURNAL_FILENAME,
+    MAX_BACKOFF_SECONDS,
+    MAX_CONCURRENT_DOWNLOADS,
+    METADATA_FILENAME,
+    Downloader,
+    TokenBucket,
+    create_client,
+    existing_pdf_ids,
+    load_opinions,
+    request_with_retry,
+)
+
+try:
+    import orjson
+except ImportError:  # Optional: faster metadata serialization
+    orjson = None  # type: ignore[assignment]
 
 logging.basicConfig(
     level=logging.INFO,
@@ -41,214 +64,285 @@ logging.basicConfig(
 logger = logging.getLogger(__name__)
 
 COURTLISTENER_SEARCH_URL = "https://www.courtlistener.com/api/rest/v4/search/"
-COURTLISTENER_STORAGE_URL = "https://storage.courtlistener.com"
 
-# Rate limiting configuration - CourtListener is a small nonprofit, be very gentle
-BASE_DELAY_SECONDS = 3.0  # Minimum delay between requests (conservative)
-MAX_RETRIES = 8  # Maximum retries on 429/5xx errors
-BACKOFF_FACTOR = 2.5  # Exponential backoff multiplier
-MAX_BACKOFF_SECONDS = 300  # Maximum backoff delay (5 minutes)
+MIN_DELAY_SECONDS = 1.0  # Shortest delay the adaptive rate limiter will reach
+SEARCH_CACHE_DIRNAME = ".search_cache"  # Raw search pages, replayed on resume
+SEARCH_STATE_FILENAME = "state.json"  # Resume cursor, kept in the search cache
+
+# Metadata schema: (search API field, metadata field), in output order.
+# Case-level fields come from the search result, the rest from each opinion.
+ITEM_KEYS = (
+    ("cluster_id", "cluster_id"),
+    ("caseName", "case_name"),
+    ("court", "court"),
+    ("court_id", "court_id"),
+    ("dateFiled", "date_filed"),
+    ("docketNumber", "docket_number"),
+    ("citation", "citations"),
+)
+OPINION_KEYS = (
+    ("id", "opinion_id"),
+    ("local_path", "local_path"),
+    ("download_url", "download_url"),
+    ("type", "opinion_type"),
+)
+# Values for case-level fields missing from a search result (None otherwise)
+FIELD_DEFAULTS: dict[str, Any] = {"citation": []}
 
 
-def request_with_retry(
-    client: httpx.Client,
-    url: str,
-    params: dict[str, Any] | None = None,
-    *,
-    follow_redirects: bool = False,
-) -> httpx.Response:
-    """Make an HTTP request with exponential backoff on rate limit/server errors.
+def build_search_params(
+    query: str, court_filter: str | None = None, filed_after: str | None = None
+) -> dict[str, str | int]:
+    """Build the CourtListener search parameters for a query.
+
+    Args:
+        query: Search query string.
+        court_filter: Court ID to filter results (e.g., "cafc").
+        filed_after: Only return opinions filed after this date (YYYY-MM-DD).
+
+    Returns:
+        Query parameters for the first search request.
+    """
+    params: dict[str, str | int] = {
+        "q": query,
+        "type": "o",  # opinions
+        "order_by": "dateFiled desc",
+        "page_size": 20,
+    }
+    if court_filter:
+        params["court"] = court_filter
+    if filed_after:
+        params["filed_after"] = filed_after
+    return params
+
+
+def search_cache_key(params: dict[str, str | int], cursor: str | None) -> str:
+    """Build the cache filename stem for one page of search results.
+
+    Args:
+        params: Search parameters (query, court, filed_after, ...).
+        cursor: Cursor URL of the page, or None for the first page.
+
+    Returns:
+        Short hex digest identifying the page.
+    """
+    payload = json.dumps([params, cursor], sort_keys=True).encode()
+    return hashlib.blake2b(payload, digest_size=8).hexdigest()
+
+
+async def fetch_search_page(
+    client: httpx.AsyncClient,
+    bucket: TokenBucket,
+    params: dict[str, str | int],
+    cursor: str | None,
+    cache_dir: Path | None,
+) -> dict[str, Any]:
+    """Fetch one page of search results, replaying it from the cache if present.
 
     Args:
         client: HTTP client for requests.
-        url: URL to request.
-        params: Optional query parameters.
-        follow_redirects: Whether to follow redirects.
+        bucket: Rate limiter shared by all requests.
+        params: Search parameters, sent only with the first page.
+        cursor: Cursor URL of the page, or None for the first page.
+        cache_dir: Directory of cached pages (None to disable caching).
 
     Returns:
-        HTTP response.
+        Decoded search response.
 
     Raises:
-        httpx.HTTPError: If all retries are exhausted.
+        httpx.HTTPError: If the request fails after all retries.
     """
-    delay = BASE_DELAY_SECONDS
-    last_exception: Exception | None = None
-
-    for attempt in range(MAX_RETRIES + 1):
-        # Wait before request (always, to be respectful)
-        if attempt > 0:
-            # Add jitter to avoid thundering herd
-            jitter = random.uniform(0, delay * 0.1)
-            sleep_time = delay + jitter
-            logger.info(
-                f"Rate limited. Waiting {sleep_time:.1f}s (attempt {attempt + 1}/{MAX_RETRIES + 1})"
-            )
-            time.sleep(sleep_time)
-            delay = min(delay * BACKOFF_FACTOR, MAX_BACKOFF_SECONDS)
-        else:
-            time.sleep(BASE_DELAY_SECONDS)
-
-        try:
-            if params:
-                response = client.get(url, params=params, follow_redirects=follow_redirects)
-            else:
-                response = client.get(url, follow_redirects=follow_redirects)
-
-            # Handle rate limiting (429) and server errors (5xx)
-            if response.status_code == 429:
-                # Check for Retry-After header
-                retry_after = response.headers.get("Retry-After")
-                if retry_after:
-                    with contextlib.suppress(ValueError):
-                        delay = max(float(retry_after), delay)
-                last_exception = httpx.HTTPStatusError(
-                    "Rate limited (429)",
-                    request=response.request,
-                    response=response,
-                )
-                continue
-
-            if response.status_code >= 500:
-                last_exception = httpx.HTTPStatusError(
-                    f"Server error ({response.status_code})",
-                    request=response.request,
-                    response=response,
-                )
-                continue
-
-            # Raise for other client errors
-            response.raise_for_status()
-            return response
-
-        except httpx.TimeoutException as e:
-            last_exception = e
-            logger.warning(f"Request timed out: {e}")
-            continue
-        except httpx.RequestError as e:
-            last_exception = e
-            logger.warning(f"Request failed: {e}")
-            continue
-
-    # All retries exhausted
-    if last_exception:
-        raise last_exception
-    raise httpx.HTTPError("All retries exhausted")
-
-
-def search_opinions(
-    client: httpx.Client,
+    cache_path: Path | None = None
+    if cache_dir is not None:
+        cache_path = cache_dir / f"{search_cache_key(params, cursor)}.json"
+        if cache_path.exists():
+            try:
+                with cache_path.open(encoding="utf-8") as f:
+                    cached: dict[str, Any] = json.load(f)
+                return cached
+            except json.JSONDecodeError:
+                # A damaged page is a cache miss; fetch it again below
+                logger.warning(f"Discarding corrupt cached search page {cache_path.name}")
+                cache_path.unlink()
+
+    if cursor is None:
+        response = await request_with_retry(
+            client, bucket, COURTLISTENER_SEARCH_URL, params=dict(params)
+        )
+    else:
+        # Cursor-based pagination URL already has params
+        response = await request_with_retry(client, bucket, cursor)
+
+    data: dict[str, Any] = response.json()
+    if cache_path is not None:
+        cache_path.parent.mkdir(parents=True, exist_ok=True)
+        # Write atomically so an interrupted run never leaves a partial page
+        tmp_path = cache_path.with_suffix(".json.tmp")
+        tmp_path.write_bytes(response.content)
+        os.replace(tmp_path, cache_path)
+    return data
+
+
+async def search_pages(
+    client: httpx.AsyncClient,
+    bucket: TokenBucket,
     query: str,
     max_results: int,
     *,
     court_filter: str | None = None,
     filed_after: str | None = None,
-) -> list[dict[str, Any]]:
-    """Search CourtListener for opinions matching a query.
+    cache_dir: Path | None = None,
+    skip_ids: Collection[str] = frozenset(),
+    start_cursor: str | None = None,
+) -> AsyncIterator[tuple[str | None, list[dict[str, Any]]]]:
+    """Search CourtListener for opinions matching a query, one page at a time.
 
     Uses cursor-based pagination and filters for opinions that have
-    downloadable PDFs.
+    downloadable PDFs. Pages found in ``cache_dir`` are replayed without
+    touching the network; new pages are written there as they arrive.
+    Each page is yielded as soon as it is parsed, so callers can start
+    downloading while the next page is fetched.
 
     Args:
         client: HTTP client for requests.
+        bucket: Rate limiter shared by all requests.
         query: Search query string.
-        max_results: Maximum number of results to return.
+        max_results: Maximum number of results to return across all pages.
         court_filter: Court ID to filter results (e.g., "cafc").
         filed_after: Only return opinions filed after this date (YYYY-MM-DD).
+        cache_dir: Directory of cached search pages (None to disable caching).
+        skip_ids: Opinion IDs to leave out (already in the corpus); they do
+            not count towards ``max_results``.
+        start_cursor: Cursor URL to resume pagination from (None to start over).
 
-    Returns:
-        List of opinion metadata dictionaries.
+    Yields:
+        The page's cursor and the opinion metadata dictionaries it contributed.
     """
-    results: list[dict[str, Any]] = []
-    params: dict[str, str | int] = {
-        "q": query,
-        "type": "o",  # opinions
-        "order_by": "dateFiled desc",
-        "page_size": 20,
-    }
-    if court_filter:
-        params["court"] = court_filter
-    if filed_after:
-        params["filed_after"] = filed_after
+    found = 0
+    params = build_search_params(query, court_filter, filed_after)
 
-    url: str | None = COURTLISTENER_SEARCH_URL
-    use_params = True  # Only use params on first request
+    cursor = start_cursor  # None fetches the first page using params
 
-    with tqdm(total=max_results, desc="Searching", unit="opinions") as pbar:
-        while url and len(results) < max_results:
-            try:
-                if use_params:
-                    response = request_with_retry(client, url, params=params)
-                    use_params = False
-                else:
-                    # Cursor-based pagination URL already has params
-                    response = request_with_retry(client, url)
-
-                data = response.json()
-            except httpx.HTTPError as e:
-                logger.error(f"Search request failed: {e}")
+    while found < max_results:
+        try:
+            data = await fetch_search_page(client, bucket, params, cursor, cache_dir)
+        except httpx.HTTPError as e:
+            logger.error(f"Search request failed: {e}")
+            break
+
+        batch = data.get("results", [])
+        if not batch:
+            break
+
+        # Filter to only opinions with downloadable PDFs
+        results: list[dict[str, Any]] = []
+        for item in batch:
+            if found + len(results) >= max_results:
                 break
 
-            batch = data.get("results", [])
-            if not batch:
-                break
+            # Case-level fields are shared by every opinion in the cluster
+            case_fields = {dst: item.get(src, FIELD_DEFAULTS.get(src)) for src, dst in ITEM_KEYS}
 
-            # Filter to only opinions with downloadable PDFs
-            for item in batch:
-                if len(results) >= max_results:
+            opinions = item.get("opinions", [])
+            for opinion in opinions:
+                if found + len(results) >= max_results:
                     break
 
-                opinions = item.get("opinions", [])
-                for opinion in opinions:
-                    if len(results) >= max_results:
-                        break
-
-                    local_path = opinion.get("local_path")
-                    if local_path and local_path.endswith(".pdf"):
-                        results.append(
-                            {
-                                "cluster_id": item.get("cluster_id"),
-                                "case_name": item.get("caseName"),
-                                "court": item.get("court"),
-                                "court_id": item.get("court_id"),
-                                "date_filed": item.get("dateFiled"),
-                                "docket_number": item.get("docketNumber"),
-                                "citations": item.get("citation", []),
-                                "opinion_id": opinion.get("id"),
-                                "local_path": local_path,
-                                "download_url": opinion.get("download_url"),
-                                "opinion_type": opinion.get("type"),
-                            }
-                        )
-                        pbar.update(1)
-
-            url = data.get("next")
-
-    return results
-
-
-def download_pdf(client: httpx.Client, local_path: str, output_path: Path) -> bool:
-    """Download a PDF from CourtListener storage.
+                local_path = opinion.get("local_path")
+                if str(opinion.get("id")) in skip_ids:
+                    continue
+                if local_path and local_path.endswith(".pdf"):
+                    record = case_fields.copy()
+                    record.update({dst: opinion.get(src) for src, dst in OPINION_KEYS})
+                    results.append(record)
+
+        found += len(results)
+        yield cursor, results
+
+        cursor = data.get("next")
+        if not cursor:
+            break
+
+
+def encode_json_line(record: dict[str, Any]) -> bytes:
+    """Encode a record as one line of JSON Lines, using orjson when installed.
 
     Args:
-        client: HTTP client for requests.
-        local_path: Path on CourtListener storage (e.g., "pdf/2025/03/10/file.pdf").
-        output_path: Local path to save the file.
+        record: JSON-serializable record.
 
     Returns:
-        True if download succeeded, False otherwise.
+        UTF-8 encoded JSON followed by a newline.
     """
-    url = f"{COURTLISTENER_STORAGE_URL}/{local_path}"
-    try:
-        response = request_with_retry(client, url, follow_redirects=True)
-        output_path.parent.mkdir(parents=True, exist_ok=True)
-        output_path.write_bytes(response.content)
-        return True
-    except httpx.HTTPError as e:
-        logger.warning(f"Failed to download {url}: {e}")
-        return False
+    if orjson is not None:
+        return orjson.dumps(record) + b"\n"
+    return json.dumps(record, ensure_ascii=False).encode("utf-8") + b"\n"
+
+
+def write_metadata(metadata_path: Path, metadata: dict[str, Any]) -> None:
+    """Write corpus metadata atomically.
 
+    The JSON is written to a temporary file and renamed over
+    ``metadata_path``, so an interrupted write never corrupts the existing
+    file. Uses orjson when installed, falling back to the stdlib encoder.
 
-def download_corpus(
+    Args:
+        metadata_path: Destination metadata.json path.
+        metadata: Metadata document to serialize.
+    """
+    tmp_path = metadata_path.with_suffix(".json.tmp")
+    if orjson is not None:
+        tmp_path.write_bytes(orjson.dumps(metadata, option=orjson.OPT_INDENT_2))
+    else:
+        with tmp_path.open("w", encoding="utf-8") as f:
+            json.dump(metadata, f, indent=2, ensure_ascii=False)
+    os.replace(tmp_path, metadata_path)
+
+
+def compact_metadata(corpus_dir: Path, corpus_name: str) -> int:
+    """Fold the metadata.jsonl journal into a rewritten metadata.json.
+
+    The search query and court filter in the envelope come from the last
+    recorded search, falling back to the existing metadata.json.
+
+    Args:
+        corpus_dir: Corpus directory.
+        corpus_name: Corpus name recorded in the envelope.
+
+    Returns:
+        Total number of opinions written.
+    """
+    metadata_path = corpus_dir / METADATA_FILENAME
+    journal_path = corpus_dir / JOURNAL_FILENAME
+    state_path = corpus_dir / SEARCH_CACHE_DIRNAME / SEARCH_STATE_FILENAME
+
+    search_query: str | None = None
+    court_filter: str | None = None
+    if state_path.exists():
+        with state_path.open(encoding="utf-8") as f:
+            params = json.load(f).get("params", {})
+        search_query = params.get("q")
+        court_filter = params.get("court")
+    elif metadata_path.exists():
+        # Envelope fields precede the opinions list, so this stops early
+        with metadata_path.open("rb") as metadata_file:
+            search_query = next(ijson.items(metadata_file, "search_query"), None)
+            metadata_file.seek(0)
+            court_filter = next(ijson.items(metadata_file, "court_filter"), None)
+
+    opinions = load_opinions(corpus_dir)
+    metadata: dict[str, Any] = {
+        "corpus": corpus_name,
+        "search_query": search_query,
+        "court_filter": court_filter,
+        "total_opinions": len(opinions),
+        "opinions": list(opinions.values()),
+    }
+    write_metadata(metadata_path, metadata)
+    journal_path.unlink(missing_ok=True)
+    return len(opinions)
+
+
+async def download_corpus(
     query: str,
     corpus_name: str,
     data_dir: Path,
@@ -256,11 +350,17 @@ def download_corpus(
     *,
     court_filter: str | None = None,
     filed_after: str | None = None,
+    concurrency: int = MAX_CONCURRENT_DOWNLOADS,
+    refresh_search: bool = False,
+    revalidate: bool = False,
 ) -> None:
     """Download a corpus of opinions based on a search query.
 
     Creates or updates a corpus directory with PDFs and metadata.
-    Supports resumable downloads by checking existing files.
+    Supports resumable downloads by checking existing files, and replays
+    cached search pages so a resumed run does not re-paginate the search.
+    Each newly recorded opinion is appended to metadata.jsonl as soon as
+    its download finishes; ``compact_metadata`` folds it into metadata.json.
 
     Args:
         query: Search query string.
@@ -269,80 +369,141 @@ def download_corpus(
         max_docs: Maximum number of documents to download.
         court_filter: Optional court ID filter.
         filed_after: Only download opinions filed after this date.
+        concurrency: Maximum number of PDFs downloaded at once.
+        refresh_search: Discard cached search pages and query CourtListener again.
+        revalidate: Check existing PDFs against CourtListener with a HEAD request.
     """
     corpus_dir = data_dir / corpus_name
     opinions_dir = corpus_dir / "opinions"
-    metadata_path = corpus_dir / "metadata.json"
+    journal_path = corpus_dir / JOURNAL_FILENAME
+    search_cache_dir = corpus_dir / SEARCH_CACHE_DIRNAME
+    state_path = search_cache_dir / SEARCH_STATE_FILENAME
 
     opinions_dir.mkdir(parents=True, exist_ok=True)
+    if refresh_search and search_cache_dir.exists():
+        shutil.rmtree(search_cache_dir)
 
     # Load existing metadata for resume capability
-    existing_metadata: dict[str, dict[str, Any]] = {}
-    if metadata_path.exists():
-        with metadata_path.open(encoding="utf-8") as f:
-            existing_data = json.load(f)
-            existing_metadata = {
-                str(item["opinion_id"]): item for item in existing_data.get("opinions", [])
-            }
+    existing_metadata = load_opinions(corpus_dir)
+    if existing_metadata:
         logger.info(f"Found {len(existing_metadata)} existing opinions in metadata")
 
-    # Count existing PDFs
-    existing_pdfs = {p.stem for p in opinions_dir.glob("*.pdf")}
-    logger.info(f"Found {len(existing_pdfs)} existing PDFs")
-
-    headers = {
-        "User-Agent": "BiteSizeRAG-Corpus-Builder/1.0 (legal research; rate-limited)",
-    }
+    search_state: dict[str, Any] | None = None
+    if state_path.exists():
+        with state_path.open(encoding="utf-8") as f:
+            search_state = json.load(f)
 
-    with httpx.Client(headers=headers, timeout=60.0) as client:
-        logger.info(f"Searching for opinions matching: {query}")
+    # Count existing PDFs; only those with metadata are complete and can be
+    # left out of the search
+    existing_pdfs = existing_pdf_ids(opinions_dir)
+    complete_ids = existing_pdfs & existing_metadata.keys()
+    logger.info(f"Found {len(existing_pdfs)} existing PDFs")
 
-        opinions = search_opinions(
-            client,
-            query,
-            max_results=max_docs,
-            court_filter=court_filter,
-            filed_after=filed_after,
-        )
+    # Resume pagination where the last run left off, if it ran the same search
+    search_params = build_search_params(query, court_filter, filed_after)
+    start_cursor: str | None = None
+    if search_state and search_state.get("params") == search_params:
+        start_cursor = search_state.get("last_cursor")
+
+    # One bucket paces every request (search and downloads). It starts at
+    # BASE_DELAY_SECONDS and adapts between MIN_DELAY_SECONDS and MAX_BACKOFF_SECONDS.
+    bucket = TokenBucket(
+        rate=1.0 / BASE_DELAY_SECONDS,
+        min_rate=1.0 / MAX_BACKOFF_SECONDS,
+        max_rate=1.0 / MIN_DELAY_SECONDS,
+    )
 
-        logger.info(f"Found {len(opinions)} opinions with PDFs")
+    # Complete opinions are passed to the downloader too, so truncated or
+    # stale PDFs are refetched
+    recheck = [item for key, item in existing_metadata.items() if key in complete_ids]
+    needed = max_docs - len(complete_ids)
+    pages: list[tuple[str | None, set[str]]] = []
+
+    async with create_client(concurrency) as client:
+
+        async def opinions_to_fetch() -> AsyncIterator[dict[str, Any]]:
+            for opinion in recheck:
+                yield opinion
+            if needed <= 0:
+                logger.info(f"Already have {len(complete_ids)} opinions, skipping search")
+                return
+
+            logger.info(f"Searching for {needed} more opinions matching: {query}")
+            async for cursor, page_results in search_pages(
+                client,
+                bucket,
+                query,
+                max_results=needed,
+                court_filter=court_filter,
+                filed_after=filed_after,
+                cache_dir=search_cache_dir,
+                skip_ids=complete_ids,
+                start_cursor=start_cursor,
+            ):
+                pages.append((cursor, {str(o["opinion_id"]) for o in page_results}))
+                for opinion in page_results:
+                    yield opinion
+
+        # Download PDFs concurrently while later search pages are still being
+        # fetched; the bucket still enforces the global rate
+        downloader = Downloader(client, bucket, revalidate=revalidate)
+        with journal_path.open("ab") as journal:
+            # Terminate a line torn by an interrupted run, so the first new
+            # record is not glued onto it and discarded with it
+            if journal_path.stat().st_size > 0:
+                with journal_path.open("rb") as tail:
+                    tail.seek(-1, os.SEEK_END)
+                    if tail.read(1) != b"\n":
+                        journal.write(b"\n")
+
+            def record_result(opinion: dict[str, Any], status: str) -> None:
+                opinion_id = str(opinion["opinion_id"])
+                # Existing files found by the search still need their metadata
+                if status == "downloaded" or (
+                    status == "skipped" and opinion_id not in existing_metadata
+                ):
+                    existing_metadata[opinion_id] = opinion
+                    journal.write(encode_json_line(opinion))
+                    journal.flush()
+
+            # Journal each opinion as it finishes, so an interrupted run keeps
+            # the metadata for everything it downloaded
+            results = await downloader.fetch_all(
+                opinions_to_fetch(),
+                opinions_dir,
+                concurrency=concurrency,
+                total=len(recheck) + max(needed, 0),
+                on_result=record_result,
+            )
+        logger.info(f"Found {sum(len(ids) for _, ids in pages)} opinions with PDFs")
 
-        # Download PDFs
         downloaded = 0
         skipped = 0
         failed = 0
 
-        for opinion in tqdm(opinions, desc="Downloading PDFs", unit="files"):
-            opinion_id = str(opinion["opinion_id"])
-            pdf_filename = f"{opinion_id}.pdf"
-            pdf_path = opinions_dir / pdf_filename
-
-            # Skip if already downloaded
-            if pdf_path.exists():
+        for opinion, status in results:
+            if status == "skipped":
                 skipped += 1
-                # Ensure metadata is updated even for existing files
-                if opinion_id not in existing_metadata:
-                    existing_metadata[opinion_id] = opinion
-                continue
-
-            if download_pdf(client, opinion["local_path"], pdf_path):
+            elif status == "downloaded":
                 downloaded += 1
-                existing_metadata[opinion_id] = opinion
             else:
                 failed += 1
-                logger.warning(f"Failed to download opinion {opinion_id}")
-
-        # Save metadata
-        metadata = {
-            "corpus": corpus_name,
-            "search_query": query,
-            "court_filter": court_filter,
-            "total_opinions": len(existing_metadata),
-            "opinions": list(existing_metadata.values()),
+                logger.warning(f"Failed to download opinion {opinion['opinion_id']}")
+
+        # Advance the saved cursor up to the first page with a failed download,
+        # so the next run picks up from there instead of re-paginating
+        failed_ids = {
+            str(opinion["opinion_id"]) for opinion, status in results if status == "failed"
         }
+        for cursor, page_ids in pages:
+            search_state = {"params": search_params, "last_cursor": cursor}
+            if page_ids & failed_ids:
+                break
 
-        with metadata_path.open("w", encoding="utf-8") as f:
-            json.dump(metadata, f, indent=2, ensure_ascii=False)
+        if pages:
+            state_path.parent.mkdir(parents=True, exist_ok=True)
+            with state_path.open("w", encoding="utf-8") as f:
+                json.dump(search_state, f)
 
         logger.info(f"Downloaded: {downloaded}, Skipped: {skipped}, Failed: {failed}")
         logger.info(f"Total opinions in corpus: {len(existing_metadata)}")
@@ -364,6 +525,7 @@ Examples:
     parser.add_argument(
         "query",
         type=str,
+        nargs="?",
         help="Search query for CourtListener (e.g., 'patent infringement')",
     )
     parser.add_argument(
@@ -396,24 +558,64 @@ Examples:
         default=None,
         help="Data directory path (default: ../data/)",
     )
+    parser.add_argument(
+        "--concurrency",
+        type=int,
+        default=MAX_CONCURRENT_DOWNLOADS,
+        help=f"Maximum PDFs downloaded at once (default: {MAX_CONCURRENT_DOWNLOADS})",
+    )
+    parser.add_argument(
+        "--refresh-search",
+        action="store_true",
+        help="Ignore cached search results and query CourtListener again",
+    )
+    parser.add_argument(
+        "--revalidate",
+        action="store_true",
+        help="Check existing PDFs are current with a HEAD request before skipping them",
+    )
+    parser.add_argument(
+        "--compact",
+        action="store_true",
+        help="Fold metadata.jsonl into metadata.json (after downloading, if a query is given)",
+    )
 
     args = parser.parse_args()
+    if args.query is None and not args.compact:
+        parser.error("a query is required unless --compact is given")
 
     # Determine data directory
     script_dir = Path(__file__).resolve().parent
     data_dir = args.data_dir or (script_dir.parent / "data")
     data_dir.mkdir(parents=True, exist_ok=True)
 
+    if args.query is None:
+        if not (data_dir / args.corpus).is_dir():
+            parser.error(f"corpus directory not found: {data_dir / args.corpus}")
+        total = compact_metadata(data_dir / args.corpus, args.corpus)
+        logger.info(f"Compacted {total} opinions into metadata.json")
+        return
+
     try:
-        download_corpus(
-            query=args.query,
-            corpus_name=args.corpus,
-            data_dir=data_dir,
-            max_docs=args.max_docs,
-            court_filter=args.court,
-            filed_after=args.filed_after,
+        asyncio.run(
+            download_corpus(
+                query=args.query,
+                corpus_name=args.corpus,
+                data_dir=data_dir,
+                max_docs=args.max_docs,
+                court_filter=args.court,
+                filed_after=args.filed_after,
+                concurrency=args.concurrency,
+                refresh_search=args.refresh_search,
+                revalidate=args.revalidate,
+            )
         )
         logger.info("Download complete!")
+        if args.compact:
+            total = compact_metadata(data_dir / args.corpus, args.corpus)
+            logger.info(f"Compacted {total} opinions into metadata.json")
+        else:
+            logger.info("Re-run with --compact to fold new opinions into metadata.json")
 
     except KeyboardInterrupt:
         logger.warning("\nDownload interrupted by user (Ctrl+C)")
@@ -1,70 +1,77 @@
 #!/usr/bin/env python3
 """Download opinions from a curated corpus.
 
-Reads metadata.json and downloads all PDFs from CourtListener storage.
+Reads metadata.json (plus any metadata.jsonl journal not yet compacted) and
+downloads all PDFs from CourtListener storage.
 """
 
 import argparse
-import json
+import asyncio
+import logging
 import sys
-import time
 from pathlib import Path
-from typing import Any
 
-import httpx
-from tqdm import tqdm
+from _courtlistener import (
+    JOURNAL_FILENAME,
+    MAX_BACKOFF_SECONDS,
+    MAX_CONCURRENT_DOWNLOADS,
+    METADATA_FILENAME,
+    Downloader,
+    TokenBucket,
+    create_client,
+    load_opinions,
+)
 
-COURTLISTENER_STORAGE_URL = "https://storage.courtlistener.com"
+logging.basicConfig(level=logging.WARNING, format="%(levelname)s - %(message)s")
 
 
-def download_corpus(
+async def download_corpus(
     corpus_dir: Path,
     delay: float = 1.0,
     max_docs: int | None = None,
+    concurrency: int = MAX_CONCURRENT_DOWNLOADS,
+    revalidate: bool = False,
 ) -> None:
     """Download opinions in a corpus from CourtListener storage.
 
     Args:
         corpus_dir: Path to corpus directory containing metadata.json.
-        delay: Seconds to wait between downloads.
+        delay: Minimum seconds between the start of consecutive downloads.
         max_docs: Maximum number of opinions to download (None for all).
+        concurrency: Maximum number of PDFs downloaded at once.
+        revalidate: Check existing PDFs against CourtListener with a HEAD request.
     """
-    metadata_path = corpus_dir / "metadata.json"
-    if not metadata_path.exists():
-        print(f"Error: {metadata_path} not found", file=sys.stderr)
+    # Opinions recorded since the last --compact are only in the journal
+    metadata_paths = [corpus_dir / METADATA_FILENAME, corpus_dir / JOURNAL_FILENAME]
+    if not any(path.exists() for path in metadata_paths):
+        print(f"Error: {metadata_paths[0]} not found", file=sys.stderr)
         sys.exit(1)
 
-    with open(metadata_path) as f:
-        metadata: dict[str, Any] = json.load(f)
+    opinions = list(load_opinions(corpus_dir).values())[:max_docs]
 
     opinions_dir = corpus_dir / "opinions"
     opinions_dir.mkdir(exist_ok=True)
 
-    opinions: list[dict[str, Any]] = metadata.get("opinions", [])
-    if max_docs is not None:
-        opinions = opinions[:max_docs]
-
     print(f"Downloading {len(opinions)} opinions to {opinions_dir}")
 
-    with httpx.Client(timeout=60.0, follow_redirects=True) as client:
-        for opinion in tqdm(opinions, desc="Downloading", unit="opinion"):
-            opinion_id: str = str(opinion["opinion_id"])
-            local_path: str = opinion["local_path"]
-            pdf_url = f"{COURTLISTENER_STORAGE_URL}/{local_path}"
-            pdf_path = opinions_dir / f"{opinion_id}.pdf"
-
-            if pdf_path.exists():
-                continue
-
-            try:
-                response = client.get(pdf_url)
-                response.raise_for_status()
-                pdf_path.write_bytes(response.content)
-            except httpx.HTTPError as e:
-                tqdm.write(f"Error downloading {opinion_id}: {e}")
-
-            time.sleep(delay)
-
+    # Never faster than --delay; back off further if CourtListener answers 429
+    bucket = None
+    if delay > 0:
+        bucket = TokenBucket(
+            rate=1.0 / delay,
+            min_rate=1.0 / MAX_BACKOFF_SECONDS,
+            max_rate=1.0 / delay,
+        )
+
+    async with create_client(concurrency) as client:
+        downloader = Downloader(client, bucket, revalidate=revalidate)
+        results = await downloader.fetch_all(
+            opinions, opinions_dir, concurrency=concurrency, total=len(opinions)
+        )
+
+    failed = sum(status == "failed" for _, status in results)
+    if failed:
+        print(f"Failed to download {failed} opinions; re-run to retry", file=sys.stderr)
     print("Done")
 
 
@@ -78,12 +85,23 @@ def main() -> None:
         default=1.0,
         help="Delay between requests in seconds (default: 1.0)",
     )
+    parser.add_argument(
+        "--concurrency",
+        type=int,
+        default=MAX_CONCURRENT_DOWNLOADS,
+        help=f"Maximum PDFs downloaded at once (default: {MAX_CONCURRENT_DOWNLOADS})",
+    )
     parser.add_argument(
         "--max-docs",
         type=int,
         default=None,
         help="Maximum number of opinions to download (default: all)",
     )
+    parser.add_argument(
+        "--revalidate",
+        action="store_true",
+        help="Check existing PDFs are complete with a HEAD request before skipping them",
+    )
     args = parser.parse_args()
 
     script_dir = Path(__file__).parent
@@ -94,7 +112,9 @@ def main() -> None:
         print(f"Error: Corpus directory not found: {corpus_dir}", file=sys.stderr)
         sys.exit(1)
 
-    download_corpus(corpus_dir, args.delay, args.max_docs)
+    asyncio.run(
+        download_corpus(corpus_dir, args.delay, args.max_docs, args.concurrency, args.revalidate)
+    )
 
 
 if __name__ == "__main__":